@@ -1,21 +1,26 @@
 # -*- coding: utf-8 -*-
+from asyncio import gather, to_thread
 from logging import INFO, basicConfig
-from urllib.parse import urlparse
+from math import ceil
 
-from discord import ApplicationContext, Bot, DiscordException, Option
-from discord.ext.commands import BucketType, cooldown, CommandOnCooldown
+from discord import ApplicationContext, Bot, Embed, Intents, Message, Option
+from discord.ext import tasks
 from rich.logging import RichHandler
 
-from Spoyt.api.spotify import search_track, search_playlist, url_to_id, search_track_by_name_and_artist
-from Spoyt.api.youtube import search_video,  \
-    youtube_url_to_id, search_youtube_music_by_name, search_youtube_music_by_id
-from Spoyt.embeds import CommandOnCooldownEmbed, ErrorEmbed, IncorrectInputEmbed, SpotifyPlaylistkNotFoundEmbed, \
-    SpotifyTrackEmbed, \
-    SpotifyPlaylistEmbed, SpotifyTrackNotFoundEmbed, SpotifyUnreachableEmbed, YouTubeVideoEmbed, \
-    UnderConstructionEmbed, YouTubeMusicEmbed, TitleResponseEmbed
-from Spoyt.exceptions import SpotifyNotFoundException, SpotifyUnreachableException, YouTubeException
+from Spoyt import metrics
+from Spoyt.admission import admission
+from Spoyt.api.spotify import search_playlist, url_to_id
+from Spoyt.convert import PLATFORMS, SPOTIFY, Conversion, cached_conversion, convert_track, extract_links, \
+    link_platform
+from Spoyt.deadline import Deadline
+from Spoyt.embeds import BusyEmbed, CommandOnCooldownEmbed, ConversionSummaryEmbed, ErrorEmbed, IncorrectInputEmbed, \
+    NotAdmittedSummaryEmbed, SearchingEmbed, SpotifyPlaylistkNotFoundEmbed, SpotifyPlaylistEmbed, \
+    SpotifyUnreachableEmbed, UnderConstructionEmbed, conversion_embed, title_response_embed
+from Spoyt.exceptions import AdmissionException, RateLimitedException, SpotifyNotFoundException, \
+    SpotifyUnreachableException
 from Spoyt.logger import log
-from Spoyt.settings import BOT_TOKEN
+from Spoyt.settings import BACKFILL_TIMEOUT, BOT_TOKEN, COMMAND_DEADLINE, GUILD_BURST, LINK_DETECTION, \
+    MAX_LINKS_PER_MESSAGE, METRICS_INTERVAL, USER_BURST
 from Spoyt.utils import check_env
 
 if __name__ == '__main__':
@@ -31,29 +36,70 @@ if __name__ == '__main__':
 
     log.info('Starting Discord bot')
 
-    bot = Bot()
+    intents = Intents.default()
+    # Reading links from messages requires privileged intent
+    intents.message_content = LINK_DETECTION
+    bot = Bot(intents=intents)
+
+    @tasks.loop(seconds=METRICS_INTERVAL)
+    async def log_metrics() -> None:
+        log.info(f'Metrics: {metrics.summary()}')
 
     @bot.event
     async def on_ready() -> None:
         log.info(f'Logged in as "{bot.user}"')
+        # Fires again on every reconnect
+        if METRICS_INTERVAL > 0 and not log_metrics.is_running():
+            log_metrics.start()
+
+    def not_admitted_embed(exception: AdmissionException) -> BusyEmbed | CommandOnCooldownEmbed:
+        embed = CommandOnCooldownEmbed if isinstance(exception, RateLimitedException) else BusyEmbed
+        return embed(description=f'Retry in {ceil(exception.retry_after)} second(s).')
+
+    async def respond_not_admitted(ctx: ApplicationContext, exception: AdmissionException) -> None:
+        await ctx.respond(embed=not_admitted_embed(exception))
+
+    def lookup_deadline() -> Deadline:
+        """Lookups may outlive the first response for as long as they can be backfilled."""
+        return Deadline(COMMAND_DEADLINE + max(0.0, BACKFILL_TIMEOUT))
+
+    def title_embed(conversion: Conversion) -> Embed:
+        if conversion.title is not None:
+            return title_response_embed(conversion)
+        if conversion.pending:
+            return SearchingEmbed(description=conversion.url)
+        # Platform embeds that follow tell what was found and what failed
+        return ErrorEmbed(description=f'Could not identify the track behind {conversion.url}')
+
+    async def respond_conversion(ctx: ApplicationContext, conversion: Conversion) -> None:
+        if BACKFILL_TIMEOUT <= 0:
+            await conversion.settle(0)
+
+        title_message = await ctx.respond(embed=title_embed(conversion))
+
+        messages = {}
+        for platform in PLATFORMS:
+            messages[platform] = await ctx.channel.send(embed=conversion_embed(conversion, platform))
+        if (spotify_track := conversion.spotify):
+            await ctx.channel.send(spotify_track.track_url)
 
-    @bot.event
-    async def on_application_command_error(
-        ctx: ApplicationContext,
-        exception: DiscordException
-    ) -> None:
-        if isinstance(exception, CommandOnCooldown):
-            await ctx.respond(embed=CommandOnCooldownEmbed(
-                description=f'Retry in {int(exception.retry_after)} second(s).'
-            ))
-        else:
-            raise exception
+        if not (pending := conversion.pending):
+            log.info(f'{"Successfully" if conversion.is_complete else "Partially"} converted {conversion.url}')
+            return
+
+        log.warning(f'Deadline passed for {conversion.url}, pending: {", ".join(pending)}')
+        await conversion.settle(BACKFILL_TIMEOUT)
+        await title_message.edit(embed=title_embed(conversion))
+        for platform in pending:
+            await messages[platform].edit(embed=conversion_embed(conversion, platform))
+        if SPOTIFY in pending and (spotify_track := conversion.spotify):
+            await ctx.channel.send(spotify_track.track_url)
+        log.info(f'Backfilled {conversion.url}')
 
     @bot.slash_command(
         name='track',
         description='Search for a track'
     )
-    @cooldown(1, 5.0, BucketType.guild)
     async def track(
         ctx: ApplicationContext,
         url: Option(
@@ -62,133 +108,34 @@ if __name__ == '__main__':
             description='Starts with "https://open.spotify.com/track/..."',
             required=True
     )) -> None:
-        # YOUTUBE MUSIC
-        if urlparse(url).hostname.replace('www.', '') == 'music.youtube.com':
-            log.info(f"Received a Youtube Music link - {url}")
-            await ctx.defer()
-            ytm_details = search_youtube_music_by_id(youtube_url_to_id(url))
-            youtube_query = '{} {}'.format(ytm_details.title, ' '.join(ytm_details.artists))
-
-            try:
-                spotify_track = search_track_by_name_and_artist(ytm_details.title, " ,".join(ytm_details.artists))
-            except SpotifyNotFoundException:
-                await ctx.respond(embed=SpotifyTrackNotFoundEmbed())
-                return
-            except SpotifyUnreachableException:
-                await ctx.respond(embed=SpotifyUnreachableEmbed())
-                return
-
-            try:
-                youtube_result = search_video(youtube_query)
-            except YouTubeException as e:
-                await ctx.channel.send(embed=ErrorEmbed(
-                    description=f'```diff\n- {e}\n```'
-                ))
-                return
-
-            # await ctx.respond("\u200b")
-            # await ctx.respond(f"{" ,".join(ytm_details.artists)} - {ytm_details.title}")
-
-            await ctx.respond(embed=TitleResponseEmbed(f"{' ,'.join(spotify_track.artists)} - {spotify_track.name}"))
-
-            await ctx.channel.send(embed=YouTubeMusicEmbed(ytm_details))
-            await ctx.channel.send(embed=YouTubeVideoEmbed(youtube_result))
-            await ctx.channel.send(embed=SpotifyTrackEmbed(spotify_track))
-            await ctx.channel.send(spotify_track.track_url)
-
-            log.info(f'Successfully converted {url}')
-
-            return
-
-        # YOUTUBE
-        if urlparse(url).hostname.replace('www.', '') in ('youtube.com', 'youtu.be'):
-            log.info(f"Received a Youtube video link - {url}")
-            await ctx.defer()
-            youtube_video_id = youtube_url_to_id(url)
-            # Search YouTube Music for the YouTube video
-            ytm_details = search_youtube_music_by_id(youtube_video_id)
-
-            # Search again, we rely on YouTube Music to give us the correct song
-            youtube_query = '{} {}'.format(ytm_details.title, ' '.join(ytm_details.artists))
-            ytm_details = search_youtube_music_by_name(youtube_query)
-
-
-            try:
-                spotify_track = search_track_by_name_and_artist(ytm_details.title, " ,".join(ytm_details.artists))
-            except SpotifyNotFoundException:
-                await ctx.respond(embed=SpotifyTrackNotFoundEmbed())
-                return
-            except SpotifyUnreachableException:
-                await ctx.respond(embed=SpotifyUnreachableEmbed())
-                return
-
-            try:
-                youtube_result = search_video(youtube_query, given_video_id=youtube_video_id)
-            except YouTubeException as e:
-                await ctx.channel.send(embed=ErrorEmbed(
-                    description=f'```diff\n- {e}\n```'
-                ))
-                return
-
-            await ctx.respond(embed=TitleResponseEmbed(f"{' ,'.join(spotify_track.artists)} - {spotify_track.name}"))
-
-            await ctx.channel.send(embed=YouTubeMusicEmbed(ytm_details))
-            await ctx.channel.send(embed=YouTubeVideoEmbed(youtube_result))
-            await ctx.channel.send(embed=SpotifyTrackEmbed(spotify_track))
-            await ctx.channel.send(spotify_track.track_url)
-
-            log.info(f'Successfully converted {url}')
-
-            return
-
-        # NON-YOUTUBE OR SPOTIFY
-        if not url.startswith('https://open.spotify.com/track/'):
+        if (source := link_platform(url)) is None:
             await ctx.respond(embed=IncorrectInputEmbed())
             return
 
-        # SPOTIFY
-        log.info(f"Received a Spotify link - {url}")
+        log.info(f'Received a {source} link - {url}')
         await ctx.defer()
-        track_id = url_to_id(url)
-        try:
-            spotify_track = search_track(track_id)
-        except SpotifyNotFoundException:
-            await ctx.respond(embed=SpotifyTrackNotFoundEmbed())
-            return
-        except SpotifyUnreachableException:
-            await ctx.respond(embed=SpotifyUnreachableEmbed())
-            return
 
-        youtube_query = '{} {}'.format(spotify_track.name, ' '.join(spotify_track.artists))
-        try:
-            youtube_result = search_video(youtube_query)
-        except YouTubeException as e:
-            await ctx.channel.send(embed=ErrorEmbed(
-                description=f'```diff\n- {e}\n```'
-            ))
+        # Already converted links cost nothing upstream, so they skip admission
+        if (conversion := cached_conversion(url)) is not None:
+            await respond_conversion(ctx, conversion)
             return
 
+        # Started before admission, so queueing counts towards the deadline too
+        deadline, lookups = Deadline(COMMAND_DEADLINE), lookup_deadline()
         try:
-            ytm_details = search_youtube_music_by_name(youtube_query)
-        except YouTubeException as e:
-            await ctx.channel.send(embed=ErrorEmbed(
-                description=f'```diff\n- {e}\n```'
-            ))
+            # Slot is only held until the first response is ready, not through Discord I/O and backfill
+            async with admission.admit(ctx.author.id, ctx.guild_id, deadline=deadline):
+                conversion = await convert_track(url, deadline, lookups)
+        except AdmissionException as e:
+            log.warning(f'Not admitted {url} - {e}')
+            await respond_not_admitted(ctx, e)
             return
-
-        await ctx.respond(embed=TitleResponseEmbed(f"{' ,'.join(spotify_track.artists)} - {spotify_track.name}"))
-        await ctx.channel.send(embed=YouTubeMusicEmbed(ytm_details))
-        await ctx.channel.send(embed=YouTubeVideoEmbed(youtube_result))
-        await ctx.channel.send(embed=SpotifyTrackEmbed(spotify_track))
-        await ctx.channel.send(spotify_track.track_url)
-
-        log.info(f'Successfully converted {url}')
+        await respond_conversion(ctx, conversion)
 
     @bot.slash_command(
         name='playlist',
         description='Search for a playlist'
     )
-    @cooldown(1, 30.0, BucketType.guild)
     async def playlist(
         ctx: ApplicationContext,
         url: Option(
@@ -202,9 +149,17 @@ if __name__ == '__main__':
             await ctx.respond(embed=IncorrectInputEmbed())
             return
 
+        await ctx.defer()
         playlist_id = url_to_id(url)
+        deadline = Deadline(COMMAND_DEADLINE)
         try:
-            playlist = search_playlist(playlist_id)
+            # Playlists are heavier, so they use up a few commands worth of tokens
+            cost = min(3, USER_BURST, GUILD_BURST)
+            async with admission.admit(ctx.author.id, ctx.guild_id, cost=cost, deadline=deadline):
+                playlist = await to_thread(search_playlist, playlist_id, deadline)
+        except AdmissionException as e:
+            await respond_not_admitted(ctx, e)
+            return
         except SpotifyNotFoundException:
             await ctx.respond(embed=SpotifyPlaylistkNotFoundEmbed())
             return
@@ -219,4 +174,56 @@ if __name__ == '__main__':
         ))
         log.info('Playlist conversion issued.')
 
+    if LINK_DETECTION:
+        @bot.event
+        async def on_message(message: Message) -> None:
+            if message.author.bot or not (urls := extract_links(message.content)):
+                return
+            urls = urls[:MAX_LINKS_PER_MESSAGE]
+            log.info(f'Detected {len(urls)} link(s) in a message - {", ".join(urls)}')
+
+            guild_id = message.guild.id if message.guild else None
+            # Already converted links cost nothing upstream, the rest take a token and a slot each
+            uncached = [url for url in urls if cached_conversion(url) is None]
+            # Links over the allowance are not tried, only answered as rate limited
+            skipped = set(uncached[admission.allowance(message.author.id, guild_id):])
+
+            deadline, lookups = Deadline(COMMAND_DEADLINE), lookup_deadline()
+
+            async def convert(url: str) -> Conversion:
+                if url not in uncached:
+                    return await convert_track(url, deadline)
+                async with admission.admit(message.author.id, guild_id, deadline=deadline):
+                    return await convert_track(url, deadline, lookups)
+
+            tried = [url for url in urls if url not in skipped]
+            outcomes = dict(zip(tried, await gather(*(convert(url) for url in tried), return_exceptions=True)))
+            retry_after = admission.rate_limit_retry_after(message.author.id, guild_id)
+            entries = [outcomes[url] if url in outcomes else RateLimitedException(retry_after) for url in urls]
+            for url, entry in zip(urls, entries):
+                if isinstance(entry, AdmissionException):
+                    log.warning(f'Not admitted {url} from a message - {entry}')
+                elif isinstance(entry, BaseException):
+                    raise entry
+            if not (conversions := [entry for entry in entries if isinstance(entry, Conversion)]):
+                # Nobody asked for these conversions, so refusing all of them is not worth a reply
+                return
+
+            def summary() -> list[Embed]:
+                return [
+                    ConversionSummaryEmbed(e) if isinstance(e, Conversion) else NotAdmittedSummaryEmbed(url, e)
+                    for url, e in zip(urls, entries)
+                ]
+
+            if BACKFILL_TIMEOUT <= 0:
+                await gather(*(c.settle(0) for c in conversions))
+            reply = await message.reply(embeds=summary(), mention_author=False)
+            if not any(c.pending for c in conversions):
+                log.info(f'Converted {len(conversions)} link(s) from a message')
+                return
+
+            await gather(*(c.settle(BACKFILL_TIMEOUT) for c in conversions))
+            await reply.edit(embeds=summary())
+            log.info(f'Backfilled {len(conversions)} link(s) from a message')
+
     bot.run(BOT_TOKEN)
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+from asyncio import Condition, wait_for
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from time import monotonic
+from typing import AsyncIterator, Hashable
+
+from Spoyt import metrics
+from Spoyt.cache import LRUCache
+from Spoyt.deadline import Deadline, UNBOUNDED
+from Spoyt.exceptions import OverloadedException, RateLimitedException
+from Spoyt.settings import ADMISSION_QUEUE_SIZE, ADMISSION_WAIT, GUILD_BURST, GUILD_REFILL, \
+    MAX_CONCURRENT_CONVERSIONS, USER_BURST, USER_REFILL, YOUTUBE_DAILY_QUOTA
+
+# YouTube Data API quota resets at midnight Pacific Time
+QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+# Share of daily quota below which concurrency starts shrinking
+QUOTA_RESERVE = 0.2
+
+
+def _quota_counter() -> str:
+    return f'youtube.quota.{datetime.now(QUOTA_TIMEZONE).date()}'
+
+
+def spend_youtube_quota(units: int) -> None:
+    metrics.increment(_quota_counter(), units)
+
+
+def youtube_quota_headroom() -> float:
+    """Share of today's YouTube Data API quota that is still left."""
+    return max(0.0, 1 - metrics.get(_quota_counter()) / YOUTUBE_DAILY_QUOTA)
+
+
+class UpstreamHealth:
+    """Exponentially weighted share of upstream lookups that succeeded."""
+    def __init__(self, weight: float = 0.05) -> None:
+        self.weight = weight
+        self.score: float = 1.0
+        self._lock = Lock()
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            self.score += self.weight * (float(ok) - self.score)
+
+
+upstream_health = UpstreamHealth()
+
+
+class TokenBucket:
+    def __init__(self, burst: int, refill: float) -> None:
+        self.burst = burst
+        self.refill = refill
+        self.tokens: float = burst
+        self.updated = monotonic()
+
+    def _fill(self) -> None:
+        now = monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.refill)
+        self.updated = now
+
+    @property
+    def available(self) -> int:
+        self._fill()
+        return int(self.tokens)
+
+    def retry_after(self, cost: int = 1) -> float:
+        """Seconds until `cost` tokens are available, 0 if they are now."""
+        if cost > self.burst:
+            raise ValueError(f'Cost of {cost} can never be afforded from bucket of {self.burst}')
+        self._fill()
+        return max(0.0, (cost - self.tokens) * self.refill)
+
+    def take(self, cost: int = 1) -> None:
+        self._fill()
+        self.tokens -= cost
+
+    def refund(self, cost: int = 1) -> None:
+        self._fill()
+        self.tokens = min(self.burst, self.tokens + cost)
+
+
+class AdmissionController:
+    """
+    Decides whether a command may call upstream platforms now, later, or not at all.
+
+    Users and servers are limited by token buckets. Running conversions are limited
+    globally, the limit shrinking as upstreams fail or YouTube quota runs out.
+    Commands over the limit wait in a bounded queue, the rest are turned away.
+    """
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENT_CONVERSIONS,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        max_wait: float = ADMISSION_WAIT
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self._users = LRUCache(10000)
+        self._guilds = LRUCache(10000)
+        self._condition = Condition()
+        # Rough, running estimate of how long a conversion holds its slot
+        self._duration: float = 5.0
+
+    @property
+    def limit(self) -> int:
+        capacity = min(upstream_health.score, youtube_quota_headroom() / QUOTA_RESERVE, 1.0)
+        return max(1, round(self.max_concurrency * capacity))
+
+    @property
+    def retry_after(self) -> float:
+        return self._duration * (self.waiting / self.limit + 1)
+
+    @staticmethod
+    def _bucket(buckets: LRUCache, key: Hashable, burst: int, refill: float) -> TokenBucket:
+        if (bucket := buckets.get(key)) is None:
+            bucket = TokenBucket(burst, refill)
+            buckets.set(key, bucket)
+        return bucket
+
+    def _buckets(self, user_id: int, guild_id: int | None) -> list[TokenBucket]:
+        buckets = [self._bucket(self._users, user_id, USER_BURST, USER_REFILL)]
+        if guild_id is not None:
+            buckets.append(self._bucket(self._guilds, guild_id, GUILD_BURST, GUILD_REFILL))
+        return buckets
+
+    def allowance(self, user_id: int, guild_id: int | None) -> int:
+        """Commands the user could run right now without being rate limited."""
+        return min(b.available for b in self._buckets(user_id, guild_id))
+
+    def rate_limit_retry_after(self, user_id: int, guild_id: int | None, cost: int = 1) -> float:
+        """Seconds until the user could run a command of `cost` without being rate limited."""
+        return max(b.retry_after(cost) for b in self._buckets(user_id, guild_id))
+
+    def _rate_limit(self, buckets: list[TokenBucket], cost: int) -> None:
+        if (retry_after := max(b.retry_after(cost) for b in buckets)) > 0:
+            metrics.increment('admission.rate_limited')
+            raise RateLimitedException(retry_after)
+        for bucket in buckets:
+            bucket.take(cost)
+
+    @asynccontextmanager
+    async def admit(
+        self,
+        user_id: int,
+        guild_id: int | None,
+        cost: int = 1,
+        deadline: Deadline = UNBOUNDED
+    ) -> AsyncIterator[None]:
+        """
+        Holds a conversion slot for the duration of the block, raises `AdmissionException` if refused.
+
+        Time spent queueing counts towards the command's `deadline`, so it never waits past it.
+        """
+        buckets = self._buckets(user_id, guild_id)
+        self._rate_limit(buckets, cost)
+
+        try:
+            async with self._condition:
+                if self.active >= self.limit:
+                    if self.waiting >= self.queue_size:
+                        raise OverloadedException(self.retry_after)
+                    self.waiting += 1
+                    try:
+                        await wait_for(
+                            self._condition.wait_for(lambda: self.active < self.limit),
+                            deadline.timeout(self.max_wait)
+                        )
+                    except TimeoutError:
+                        raise OverloadedException(self.retry_after)
+                    finally:
+                        self.waiting -= 1
+                self.active += 1
+        except OverloadedException:
+            # Shedding is the bot's fault, not the user's, so it costs them nothing
+            metrics.increment('admission.shed')
+            for bucket in buckets:
+                bucket.refund(cost)
+            raise
+
+        metrics.increment('admission.admitted')
+        started = monotonic()
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.active -= 1
+                self._duration += 0.1 * (monotonic() - started - self._duration)
+                self._condition.notify_all()
+
+
+admission = AdmissionController()
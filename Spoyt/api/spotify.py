@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
+from functools import cache
+
 from spotipy import Spotify, SpotifyException, SpotifyClientCredentials
 
+from Spoyt.catalog import catalog
+from Spoyt.deadline import Deadline, UNBOUNDED
 from Spoyt.exceptions import SpotifyNotFoundException, SpotifyUnreachableException
 from Spoyt.logger import log
 from Spoyt.settings import SPOTIFY_CLIENT_ID, SPOTIFY_CLIENT_SECRET
@@ -16,6 +20,19 @@ class Track:
         ))
         self.release_date: str = payload.get('album', {}).get('release_date')
         self.cover_url: str = payload.get('album', {}).get('images', [{}])[0].get('url')
+        self.duration_ms: int | None = payload.get('duration_ms')
+        self.isrc: str | None = payload.get('external_ids', {}).get('isrc')
+
+    def to_payload(self) -> dict:
+        """Minimal Spotify payload this track can be rebuilt from."""
+        return {
+            'name': self.name,
+            'id': self.track_id,
+            'artists': [{'name': a} for a in self.artists],
+            'album': {'release_date': self.release_date, 'images': [{'url': self.cover_url}]},
+            'duration_ms': self.duration_ms,
+            'external_ids': {'isrc': self.isrc}
+        }
 
     @property
     def is_single_artist(self) -> bool:
@@ -34,7 +51,7 @@ class User:
         self.avatar_url: str = payload.get('images', [{}])[-1].get('url')
 
 class Playlist:
-    def __init__(self, payload: dict) -> None:
+    def __init__(self, payload: dict, deadline: Deadline = UNBOUNDED) -> None:
         self.name: str = payload.get('name')
         self.description: str = payload.get('description')
         self.playlist_id: str = payload.get('id')
@@ -46,7 +63,7 @@ class Playlist:
         self.total_tracks: int = payload.get('tracks', {}).get('total')
         self.query_limit: int = payload.get('tracks', {}).get('limit')
 
-        self.owner: User = search_user(payload.get('owner', {}).get('id'))
+        self.owner: User = search_user(payload.get('owner', {}).get('id'), deadline)
 
     @property
     def url(self) -> str:
@@ -69,21 +86,30 @@ def url_to_id(url: str) -> str:
 
 
 
-def spotify_connect() -> Spotify:
+@cache
+def _credentials() -> SpotifyClientCredentials:
+    """Shared, so the access token is requested once and reused until it expires."""
+    return SpotifyClientCredentials(
+        client_id=SPOTIFY_CLIENT_ID,
+        client_secret=SPOTIFY_CLIENT_SECRET,
+        requests_timeout=5
+    )
+
+
+def spotify_connect(deadline: Deadline = UNBOUNDED) -> Spotify:
+    deadline.check()
     return Spotify(
-        auth_manager=SpotifyClientCredentials(
-            client_id=SPOTIFY_CLIENT_ID,
-            client_secret=SPOTIFY_CLIENT_SECRET
-        )
+        auth_manager=_credentials(),
+        requests_timeout=deadline.timeout(5)
     )
 
 # Search functions should not return `class Track` or `class Playlist`
 # because of checks if connections was successful during runtime.
 
-def search_track(track_id: str) -> Track:
+def search_track(track_id: str, deadline: Deadline = UNBOUNDED) -> Track:
     log.info(f'Searching track by ID "{track_id}"')
     try:
-        track: dict | None = spotify_connect().track(track_id=track_id)
+        track: dict | None = spotify_connect(deadline).track(track_id=track_id)
     except SpotifyException:
         raise SpotifyNotFoundException
     if not track:
@@ -91,14 +117,19 @@ def search_track(track_id: str) -> Track:
         raise SpotifyUnreachableException
     return Track(track)
 
-def search_track_by_name_and_artist(track_name, artists):
+def search_track_by_name_and_artist(track_name, artists, deadline: Deadline = UNBOUNDED, duration: int | None = None):
     log.info(f'Searching track by name - "{track_name}" and artists - "{artists}"')
+    query = '{} {}'.format(track_name, ' '.join(a.strip() for a in artists.split(',')))
+    if catalog and (payload := catalog.match(query, 'spotify', duration=duration)):
+        return Track(payload)
     try:
-        track_items = spotify_connect().search(f"track:{track_name} artist:{artists}")["tracks"]["items"]
+        track_items = spotify_connect(deadline).search(f"track:{track_name} artist:{artists}")["tracks"]["items"]
+        if not track_items:
+            track_items = spotify_connect(deadline).search(f"track:{track_name} artist:{artists.split(',')[0].strip()}")['tracks']['items']
         if not track_items:
-            track_items = spotify_connect().search(f"track:{track_name} artist:{artists.split(',')[0].strip()}")['tracks']['items']
+            raise SpotifyNotFoundException
         track_url = track_items[0]['external_urls']['spotify']
-        track: dict | None = spotify_connect().track(track_url)
+        track: dict | None = spotify_connect(deadline).track(track_url)
         log.info(f"Found track - {track_url}")
     except SpotifyException:
         raise SpotifyNotFoundException
@@ -107,22 +138,22 @@ def search_track_by_name_and_artist(track_name, artists):
         raise SpotifyUnreachableException
     return Track(track)
 
-def search_playlist(playlist_id: str) -> Playlist:
+def search_playlist(playlist_id: str, deadline: Deadline = UNBOUNDED) -> Playlist:
     log.info(f'Searching playlist by ID "{playlist_id}"')
     try:
-        playlist: dict | None = spotify_connect().playlist(playlist_id=playlist_id)
+        playlist: dict | None = spotify_connect(deadline).playlist(playlist_id=playlist_id)
     except SpotifyException:
         raise SpotifyNotFoundException
     if not playlist:
         log.error('Spotify unreachable')
         raise SpotifyUnreachableException
-    return Playlist(playlist)
+    return Playlist(playlist, deadline)
 
 
-def search_user(user_id: str) -> User:
+def search_user(user_id: str, deadline: Deadline = UNBOUNDED) -> User:
     log.info(f'Searching user by ID "{user_id}"')
     try:
-        user: dict | None = spotify_connect().user(user=user_id)
+        user: dict | None = spotify_connect(deadline).user(user=user_id)
     except SpotifyException:
         raise SpotifyNotFoundException
     if not user:
@@ -5,22 +5,40 @@ from urllib.parse import parse_qs, urlparse
 from json import loads as json_loads
 from pathlib import Path
 
-from requests import get as requests_get
+from requests import Session, get as requests_get
 from ytmusicapi import YTMusic, OAuthCredentials
 
-from Spoyt.exceptions import YouTubeException, YouTubeForbiddenException, YouTubeURLException
+from Spoyt.admission import spend_youtube_quota
+from Spoyt.catalog import catalog
+from Spoyt.deadline import Deadline, UNBOUNDED
+from Spoyt.exceptions import YouTubeException, YouTubeForbiddenException, YouTubeMusicNotFoundException, \
+    YouTubeURLException
+from Spoyt.hedge import Hedger
 from Spoyt.logger import log
-from Spoyt.settings import YOUTUBE_API_KEY, OAUTH_CLIENT_ID, OAUTH_CLIENT_SECRET, YOUTUBE_MUSIC_BROWSER_OVERRIDE
+from Spoyt.settings import YOUTUBE_API_KEY, OAUTH_CLIENT_ID, OAUTH_CLIENT_SECRET, YOUTUBE_MUSIC_BROWSER_OVERRIDE, \
+    YOUTUBE_MUSIC_HEDGING, HEDGE_PERCENTILE, HEDGE_BUDGET, YOUTUBE_MUSIC_TIMEOUT
+
+
+class TimeoutSession(Session):
+    """Session with default timeout, as ytmusicapi does not pass any itself."""
+    def request(self, *args, **kwargs):
+        kwargs.setdefault('timeout', YOUTUBE_MUSIC_TIMEOUT)
+        return super().request(*args, **kwargs)
+
 
 if YOUTUBE_MUSIC_BROWSER_OVERRIDE:
-    ytmusic = YTMusic("browser.json")
+    ytmusic = YTMusic("browser.json", requests_session=TimeoutSession())
 
 elif Path("oauth.json").exists():
     log.info("Found oauth.json")
-    ytmusic = YTMusic("oauth.json", oauth_credentials=OAuthCredentials(client_id=OAUTH_CLIENT_ID,                                                                       client_secret=OAUTH_CLIENT_SECRET))
+    ytmusic = YTMusic("oauth.json", requests_session=TimeoutSession(), oauth_credentials=OAuthCredentials(client_id=OAUTH_CLIENT_ID,                                                                       client_secret=OAUTH_CLIENT_SECRET))
 else:
     log.info("No auth.json found. Skipping auth")
-    ytmusic = YTMusic()
+    ytmusic = YTMusic(requests_session=TimeoutSession())
+
+# Both lookups are idempotent, so a slow one can safely be issued twice
+search_hedger = Hedger('ytmusic.search', YOUTUBE_MUSIC_HEDGING, HEDGE_PERCENTILE, HEDGE_BUDGET)
+get_song_hedger = Hedger('ytmusic.get_song', YOUTUBE_MUSIC_HEDGING, HEDGE_PERCENTILE, HEDGE_BUDGET)
 
 class YouTubeVideo:
     def __init__(self, payload: dict) -> None:
@@ -49,6 +67,19 @@ class YoutubeMusic:
             self.title: str = html.unescape(yt_search_result['title'])
             self.thumbnail: str = yt_search_result['thumbnails'][0]['url'].split('=')[0]
             self.artists: list[str]  = [artist['name'] for artist in yt_search_result['artists']]
+            self.duration: int | None = yt_search_result.get('duration_seconds')
+            self.video_type: str | None = yt_search_result.get('videoType')
+
+    def to_payload(self) -> dict:
+        """Minimal YouTube Music search result this track can be rebuilt from."""
+        return {
+            'videoId': self.track_id,
+            'title': self.title,
+            'thumbnails': [{'url': self.thumbnail}],
+            'artists': [{'name': a} for a in self.artists],
+            'duration_seconds': self.duration,
+            'videoType': self.video_type
+        }
 
 
 
@@ -58,29 +89,34 @@ class YoutubeMusic:
 # Top search result that is an OMV
 # Top search result
 
-def search_video(query: str, given_video_id: str=None) -> YouTubeVideo:
+def search_video(query: str, given_video_id: str=None, deadline: Deadline = UNBOUNDED) -> YouTubeVideo:
     log.info(f"Searching YouTube for query - {query} AND/OR video id - {given_video_id}")
+    deadline.check()
 
     # If user provided a video, prioritize that
     if given_video_id:
         log.info(f'Getting details for YouTube video with id: "{given_video_id}"')
+        spend_youtube_quota(1)
         yt_r = requests_get(
             'https://www.googleapis.com/youtube/v3/videos'
             '?key={}'
             '&part=snippet'
-            '&id={}'.format(YOUTUBE_API_KEY, given_video_id)
+            '&id={}'.format(YOUTUBE_API_KEY, given_video_id),
+            timeout=deadline.timeout()
         )
         yt_video = json_loads(yt_r.content).get('items', [{}])[0]
         yt_video['id'] = {'videoId': yt_video['id']}
 
     else:
         log.info(f'Searching YouTube: "{query}"')
+        spend_youtube_quota(100)
         yt_r = requests_get(
             'https://www.googleapis.com/youtube/v3/search'
             '?key={}'
             '&part=snippet'
             '&maxResults=5'
-            '&q={}'.format(YOUTUBE_API_KEY, query)
+            '&q={}'.format(YOUTUBE_API_KEY, query),
+            timeout=deadline.timeout()
         )
         yt_response_json = json_loads(yt_r.content)
 
@@ -91,7 +127,8 @@ def search_video(query: str, given_video_id: str=None) -> YouTubeVideo:
             #  Only process videos. This API also returns playlists and channels, ignore those.
             if video_id is None:
                 continue
-            video_type = ytmusic.get_song(video_id)['videoDetails'].get('musicVideoType', '')
+            deadline.check()
+            video_type = get_song_hedger.call(ytmusic.get_song, video_id, deadline=deadline)['videoDetails'].get('musicVideoType', '')
             # Only choose Original Music Video
             if video_type == 'MUSIC_VIDEO_TYPE_OMV':
                 omv_videos.append(yt_result)
@@ -114,23 +151,37 @@ def search_video(query: str, given_video_id: str=None) -> YouTubeVideo:
     return video
 
 
-def search_youtube_music_by_name(query: str) -> YoutubeMusic:
+def search_youtube_music_by_name(
+    query: str,
+    deadline: Deadline = UNBOUNDED,
+    duration: int | None = None,
+    isrc: str | None = None
+) -> YoutubeMusic:
     log.info(f'Searching YouTube Music: "{query}"')
-    yt_search_results = ytmusic.search(query, filter='songs')[:5]
-    yt_search_result = [x for x in yt_search_results if x['videoType'] == 'MUSIC_VIDEO_TYPE_ATV'][0]
+    if catalog and (payload := catalog.match(query, 'youtube_music', duration=duration, isrc=isrc)):
+        return YoutubeMusic(payload)
+    deadline.check()
+    yt_search_results = search_hedger.call(ytmusic.search, query, filter='songs', deadline=deadline)[:5]
+    if not (songs := [x for x in yt_search_results if x['videoType'] == 'MUSIC_VIDEO_TYPE_ATV']):
+        raise YouTubeMusicNotFoundException
+    yt_search_result = songs[0]
 
     log.info(f"Found YouTube Music details for id - {yt_search_result['videoId']}")
     return YoutubeMusic(yt_search_result)
 
-def search_youtube_music_by_id(video_id: str):
+def search_youtube_music_by_id(video_id: str, deadline: Deadline = UNBOUNDED):
     log.info(f"Searching YouTube Music for id - {video_id}")
-    ytm_track_details = ytmusic.get_song(video_id)
+    deadline.check()
+    ytm_track_details = get_song_hedger.call(ytmusic.get_song, video_id, deadline=deadline)
     ytm_details  = YoutubeMusic()
     ytm_details.track_id = video_id
     ytm_details.track_link = f"https://music.youtube.com/watch?v={video_id}"
     ytm_details.title = html.unescape(ytm_track_details['videoDetails']['title'])
     ytm_details.artists = ytm_track_details['videoDetails']['author'].split(' & ')
     ytm_details.thumbnail = ytm_track_details['videoDetails']['thumbnail']['thumbnails'][0]['url'].split('=')[0]
+    ytm_details.duration = int(ytm_track_details['videoDetails'].get('lengthSeconds', 0)) or None
+    # Any video can be opened by ID, not only songs, e.g. music videos or uploads
+    ytm_details.video_type = ytm_track_details['videoDetails'].get('musicVideoType')
 
     log.info(f"Found YouTube Music details for link - {ytm_details.track_link}")
     return ytm_details
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+import re
+import sqlite3
+from difflib import SequenceMatcher
+from json import dumps as json_dumps, loads as json_loads
+from threading import Lock
+from unicodedata import combining, normalize as unicode_normalize
+
+from Spoyt.logger import log
+from Spoyt.settings import CATALOG_MIN_SCORE, CATALOG_PATH
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    artists TEXT NOT NULL,
+    -- Normalized "title artists" as named on every known platform, one per line
+    search_text TEXT NOT NULL,
+    duration INTEGER,
+    isrc TEXT,
+    spotify_id TEXT UNIQUE,
+    youtube_music_id TEXT UNIQUE,
+    youtube_video_id TEXT,
+    spotify TEXT,
+    youtube_music TEXT
+);
+CREATE INDEX IF NOT EXISTS tracks_isrc ON tracks (isrc);
+'''
+
+FTS_SCHEMA = '''
+CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5(
+    search_text, content='tracks', content_rowid='id', prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS tracks_ai AFTER INSERT ON tracks BEGIN
+    INSERT INTO tracks_fts (rowid, search_text) VALUES (new.id, new.search_text);
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_ad AFTER DELETE ON tracks BEGIN
+    INSERT INTO tracks_fts (tracks_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+END;
+CREATE TRIGGER IF NOT EXISTS tracks_au AFTER UPDATE ON tracks BEGIN
+    INSERT INTO tracks_fts (tracks_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+    INSERT INTO tracks_fts (rowid, search_text) VALUES (new.id, new.search_text);
+END;
+'''
+
+# Words telling apart recordings of the same song, e.g. "Halo (Live)" from "Halo"
+VERSION_WORDS = frozenset((
+    'live', 'remix', 'remixed', 'mix', 'edit', 'version', 'remaster', 'remastered', 'acoustic', 'unplugged',
+    'instrumental', 'demo', 'extended', 'radio', 'cover', 'karaoke', 'slowed', 'sped', 'reverb', 'feat', 'ft',
+    'featuring'
+))
+# Featured artists are often credited as artists instead, so they may differ between platforms
+CREDIT_WORDS = frozenset(('feat', 'ft', 'featuring'))
+# YouTube Music type of song uploads, the only kind searches by name return
+SONG_VIDEO_TYPE = 'MUSIC_VIDEO_TYPE_ATV'
+# Seconds by which durations of the same recording may differ between platforms
+DURATION_TOLERANCE = 3
+
+
+def _strip_remark(remark: re.Match) -> str:
+    return remark.group(0) if VERSION_WORDS & set(re.findall(r'\w+', remark.group(0))) else ' '
+
+
+def normalize(text: str) -> str:
+    """
+    Lowercases, strips accents, punctuation and bracketed remarks other than versions.
+
+    For example "Beyoncé - Halo (Official Video)" becomes "beyonce halo",
+    but "Beyoncé - Halo (Live)" becomes "beyonce halo live".
+    """
+    text = ''.join(c for c in unicode_normalize('NFKD', text) if not combining(c)).lower()
+    text = re.sub(r'[(\[].*?[)\]]', _strip_remark, text)
+    return ' '.join(re.sub(r'[^\w]+', ' ', text).split())
+
+
+def signature(normalized: str) -> tuple[frozenset[str], tuple[str, ...]]:
+    """Version words and numbers, which have to be the same for names to be of the same track."""
+    words = normalized.split()
+    versions = frozenset(w for w in words if w in VERSION_WORDS - CREDIT_WORDS)
+    return versions, tuple(sorted(w for w in words if w.isdigit()))
+
+
+def same_recording(row: dict, duration: int | None, isrc: str | None) -> bool:
+    if isrc is not None and row['isrc'] == isrc:
+        return True
+    if duration is None or row['duration'] is None:
+        return False
+    return abs(row['duration'] - duration) <= DURATION_TOLERANCE
+
+
+def similarity(a: str, b: str) -> float:
+    return SequenceMatcher(None, a, b).ratio()
+
+
+class Catalog:
+    """
+    Every track the bot has resolved, searchable by name and artists.
+
+    Uses SQLite FTS5 for candidate lookup where available, plain `LIKE` otherwise,
+    and ranks candidates by fuzzy similarity of normalized names.
+    """
+    def __init__(self, path: str) -> None:
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        self._lock = Lock()
+        with self._lock, self._connection:
+            self._connection.executescript(SCHEMA)
+            try:
+                self._connection.executescript(FTS_SCHEMA)
+                self.has_fts = True
+            except sqlite3.OperationalError:
+                log.warning('SQLite has no FTS5, catalog falls back to slower lookups')
+                self.has_fts = False
+
+    def _find(self, spotify_id: str | None, youtube_music_id: str | None) -> list[dict]:
+        rows = self._connection.execute(
+            'SELECT * FROM tracks WHERE spotify_id = ? OR youtube_music_id = ?',
+            (spotify_id, youtube_music_id)
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def add(
+        self,
+        spotify: dict | None = None,
+        youtube_music: dict | None = None,
+        youtube_video_id: str | None = None
+    ) -> None:
+        """
+        Indexes track, merging it with entries already known by any of its IDs.
+
+        `spotify` is a Spotify track payload, `youtube_music` a YouTube Music search result.
+        YouTube Music videos other than songs are left out, as name searches never return them.
+        """
+        if youtube_music is not None and youtube_music.get('videoType') != SONG_VIDEO_TYPE:
+            youtube_music = None
+        if spotify is None and youtube_music is None:
+            return
+        names, entry = [], {}
+        if youtube_music is not None:
+            artists = [a['name'] for a in youtube_music.get('artists', [])]
+            names.append(normalize('{} {}'.format(youtube_music['title'], ' '.join(artists))))
+            entry.update(
+                title=youtube_music['title'],
+                artists=', '.join(artists),
+                duration=youtube_music.get('duration_seconds'),
+                youtube_music_id=youtube_music['videoId'],
+                youtube_music=json_dumps(youtube_music)
+            )
+        if spotify is not None:
+            artists = [a['name'] for a in spotify.get('artists', [])]
+            names.append(normalize('{} {}'.format(spotify['name'], ' '.join(artists))))
+            # Spotify names are the canonical ones
+            entry.update(
+                title=spotify['name'],
+                artists=', '.join(artists),
+                duration=(d // 1000) if (d := spotify.get('duration_ms')) else entry.get('duration'),
+                isrc=spotify.get('external_ids', {}).get('isrc'),
+                spotify_id=spotify['id'],
+                spotify=json_dumps(spotify)
+            )
+        if youtube_video_id:
+            entry['youtube_video_id'] = youtube_video_id
+
+        entry = {k: v for k, v in entry.items() if v is not None}
+        with self._lock, self._connection:
+            existing = self._find(entry.get('spotify_id'), entry.get('youtube_music_id'))
+            for row in existing:
+                names.extend(row['search_text'].splitlines())
+                entry = {k: v for k, v in row.items() if k != 'id' and v is not None} | entry
+            entry['search_text'] = '\n'.join(dict.fromkeys(n for n in names if n))
+            if existing:
+                self._connection.executemany('DELETE FROM tracks WHERE id = ?', [(r['id'],) for r in existing])
+            self._connection.execute(
+                'INSERT INTO tracks ({}) VALUES ({})'.format(', '.join(entry), ', '.join('?' * len(entry))),
+                tuple(entry.values())
+            )
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        """Tracks matching any word prefix of `query`, most similar first."""
+        if not (words := normalize(query).split()):
+            return []
+        with self._lock:
+            if self.has_fts:
+                rows = self._connection.execute(
+                    'SELECT tracks.* FROM tracks_fts JOIN tracks ON tracks.id = tracks_fts.rowid '
+                    'WHERE tracks_fts MATCH ? ORDER BY bm25(tracks_fts) LIMIT ?',
+                    (' OR '.join(f'"{w}"*' for w in words), limit * 5)
+                ).fetchall()
+            else:
+                rows = self._connection.execute(
+                    'SELECT * FROM tracks WHERE {} LIMIT ?'.format(' OR '.join(['search_text LIKE ?'] * len(words))),
+                    (*(f'%{w}%' for w in words), limit * 5)
+                ).fetchall()
+        normalized = ' '.join(words)
+        scored = [(max(similarity(normalized, n) for n in r['search_text'].splitlines()), dict(r)) for r in rows]
+        scored.sort(key=lambda s: s[0], reverse=True)
+        return [row | {'score': score} for score, row in scored[:limit]]
+
+    def match(
+        self,
+        query: str,
+        platform: str,
+        duration: int | None = None,
+        isrc: str | None = None,
+        min_score: float = CATALOG_MIN_SCORE
+    ) -> dict | None:
+        """
+        Payload stored for `platform` ("spotify" or "youtube_music") of the track
+        best matching `query`, if the match is confident enough.
+
+        Names have to agree on version and numbers, and the recording on ISRC or
+        on `duration` in seconds. Without either, similar names alone are not trusted.
+        """
+        if isrc is None and duration is None:
+            return None
+        expected = signature(normalized := normalize(query))
+        for row in self.search(query, limit=5):
+            if (payload := row[platform]) is None:
+                continue
+            payload = json_loads(payload)
+            if platform == 'youtube_music' and payload.get('videoType') != SONG_VIDEO_TYPE:
+                continue
+            names = [n for n in row['search_text'].splitlines() if signature(n) == expected]
+            if not names or (score := max(similarity(normalized, n) for n in names)) < min_score:
+                continue
+            if not same_recording(row, duration, isrc):
+                continue
+            log.info(f'Found "{query}" in catalog ({score:.0%} match)')
+            return payload
+        return None
+
+
+catalog: Catalog | None = Catalog(CATALOG_PATH) if CATALOG_PATH else None
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+import re
+from asyncio import CancelledError, Task, create_task, gather, to_thread, wait
+from typing import Any
+from urllib.parse import urlparse
+
+from Spoyt.admission import upstream_health
+from Spoyt.api.spotify import Track, search_track, search_track_by_name_and_artist, url_to_id
+from Spoyt.api.youtube import YouTubeVideo, YoutubeMusic, search_video, search_youtube_music_by_id, \
+    search_youtube_music_by_name, youtube_url_to_id
+from Spoyt.cache import LRUCache
+from Spoyt.catalog import catalog
+from Spoyt.deadline import Deadline
+from Spoyt.exceptions import DeadlineExceededException, SpotifyNotFoundException, YouTubeMusicNotFoundException, \
+    YouTubeURLException
+from Spoyt.logger import log
+from Spoyt.settings import CONVERSION_CACHE_SIZE
+
+SPOTIFY = 'Spotify'
+YOUTUBE = 'YouTube'
+YOUTUBE_MUSIC = 'YouTube Music'
+
+# Order in which platforms are presented to the user
+PLATFORMS = (YOUTUBE_MUSIC, YOUTUBE, SPOTIFY)
+
+# Lookups that found nothing, which says nothing about health of the platform
+NOT_FOUND = (SpotifyNotFoundException, YouTubeMusicNotFoundException)
+
+# Discord wraps links in "<...>" to suppress previews, and messages in Markdown
+URL_PATTERN = re.compile(r'https?://[^\s<>()\[\]|*`]+')
+
+
+def link_platform(url: str) -> str | None:
+    """Tells which platform the track link belongs to, if any supported."""
+    hostname = (urlparse(url).hostname or '').replace('www.', '')
+    if hostname == 'music.youtube.com':
+        return YOUTUBE_MUSIC
+    if hostname in ('youtube.com', 'youtu.be'):
+        return YOUTUBE
+    if url.startswith('https://open.spotify.com/track/'):
+        return SPOTIFY
+    return None
+
+
+def link_key(url: str) -> tuple[str, str]:
+    """Identifies the track behind a supported link, regardless of share parameters."""
+    source = link_platform(url)
+    return source, url_to_id(url) if source == SPOTIFY else youtube_url_to_id(url)
+
+
+def extract_links(text: str) -> list[str]:
+    """Every supported track link in `text`, in order and without links to the same track."""
+    links = {}
+    for url in URL_PATTERN.findall(text):
+        # Punctuation ending a sentence is not part of the link
+        url = url.rstrip('.,;:!?\'"')
+        if link_platform(url) is None:
+            continue
+        try:
+            links.setdefault(link_key(url), url)
+        except (KeyError, YouTubeURLException):
+            # e.g. YouTube channel or playlist link
+            continue
+    return list(links.values())
+
+
+def youtube_query(title: str, artists: list[str]) -> str:
+    return '{} {}'.format(title, ' '.join(artists))
+
+
+class Conversion:
+    """Per-platform outcome of converting a single track link."""
+    def __init__(self, url: str, source: str, tasks: dict[str, Task]) -> None:
+        self.url = url
+        self.source = source
+        self.tasks = tasks
+        # Serialized embeds by template version, once the conversion is complete
+        self.rendered: dict[int, dict[str, dict]] = {}
+
+    @property
+    def spotify(self) -> Track | None:
+        return self.result(SPOTIFY)
+
+    @property
+    def youtube(self) -> YouTubeVideo | None:
+        return self.result(YOUTUBE)
+
+    @property
+    def youtube_music(self) -> YoutubeMusic | None:
+        return self.result(YOUTUBE_MUSIC)
+
+    @property
+    def title(self) -> str | None:
+        if (track := self.spotify):
+            return f"{' ,'.join(track.artists)} - {track.name}"
+        if (ytm := self.youtube_music):
+            return f"{' ,'.join(ytm.artists)} - {ytm.title}"
+        return None
+
+    @property
+    def pending(self) -> list[str]:
+        return [p for p in PLATFORMS if self.is_pending(p)]
+
+    @property
+    def is_complete(self) -> bool:
+        return all(self.result(p) is not None for p in PLATFORMS)
+
+    def is_pending(self, platform: str) -> bool:
+        return not self.tasks[platform].done()
+
+    def result(self, platform: str) -> Any | None:
+        task = self.tasks[platform]
+        if not task.done() or task.cancelled() or task.exception() is not None:
+            return None
+        return task.result()
+
+    def link(self, platform: str) -> str | None:
+        if (result := self.result(platform)) is None:
+            return None
+        if platform == SPOTIFY:
+            return result.track_url
+        if platform == YOUTUBE:
+            return result.video_link
+        return result.track_link
+
+    def error(self, platform: str) -> BaseException | None:
+        task = self.tasks[platform]
+        if not task.done():
+            return None
+        if task.cancelled():
+            return DeadlineExceededException(f'{platform} did not respond in time.')
+        return task.exception()
+
+    async def settle(self, timeout: float) -> None:
+        """Waits up to `timeout` seconds for pending platforms, then gives up on them."""
+        if not (pending := [t for t in self.tasks.values() if not t.done()]):
+            return
+        if timeout > 0:
+            await wait(pending, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await gather(*pending, return_exceptions=True)
+        await self.remember()
+
+    async def remember(self) -> None:
+        """
+        Indexes resolved tracks in the catalog, and keeps fully resolved conversion,
+        so the same link needs no lookups next time.
+        """
+        if catalog and not self.pending and (self.spotify or self.youtube_music):
+            await to_thread(
+                catalog.add,
+                spotify=self.spotify.to_payload() if self.spotify else None,
+                youtube_music=self.youtube_music.to_payload() if self.youtube_music else None,
+                youtube_video_id=self.youtube.video_id if self.youtube else None
+            )
+        if self.is_complete:
+            _conversions.set(link_key(self.url), self)
+
+
+_conversions = LRUCache(CONVERSION_CACHE_SIZE)
+
+
+def cached_conversion(url: str) -> Conversion | None:
+    return _conversions.get(link_key(url))
+
+
+async def convert_track(url: str, deadline: Deadline, lookup_deadline: Deadline | None = None) -> Conversion:
+    """
+    Resolves track link on every platform.
+
+    Returns once all platforms resolved or `deadline` passed, whichever is first;
+    lookups still running are left pending in returned conversion, so they can be
+    backfilled. Lookups themselves are bounded by the later `lookup_deadline`.
+    """
+    if (cached := cached_conversion(url)) is not None:
+        return cached
+    source = link_platform(url)
+    lookup_deadline = lookup_deadline or deadline
+
+    async def call(func, *args, **kwargs):
+        # Only counted here, as lookups depending on this one re-raise its failure
+        try:
+            result = await to_thread(func, *args, deadline=lookup_deadline, **kwargs)
+        except CancelledError:
+            upstream_health.record(False)
+            raise
+        except NOT_FOUND:
+            upstream_health.record(True)
+            raise
+        except BaseException as e:
+            log.warning(f'{func.__name__} failed - {e!r}')
+            upstream_health.record(False)
+            raise
+        upstream_health.record(True)
+        return result
+
+    if source == YOUTUBE_MUSIC:
+        ytm = create_task(call(search_youtube_music_by_id, youtube_url_to_id(url)))
+
+        async def spotify():
+            details = await ytm
+            return await call(
+                search_track_by_name_and_artist, details.title, ' ,'.join(details.artists), duration=details.duration
+            )
+
+        async def youtube():
+            details = await ytm
+            return await call(search_video, youtube_query(details.title, details.artists))
+
+        tasks = {YOUTUBE_MUSIC: ytm, YOUTUBE: create_task(youtube()), SPOTIFY: create_task(spotify())}
+
+    elif source == YOUTUBE:
+        video_id = youtube_url_to_id(url)
+        # Search again, we rely on YouTube Music to give us the correct song
+        video_details = create_task(call(search_youtube_music_by_id, video_id))
+
+        async def youtube_music():
+            details = await video_details
+            return await call(
+                search_youtube_music_by_name, youtube_query(details.title, details.artists), duration=details.duration
+            )
+
+        ytm = create_task(youtube_music())
+
+        async def spotify():
+            details = await ytm
+            return await call(
+                search_track_by_name_and_artist, details.title, ' ,'.join(details.artists), duration=details.duration
+            )
+
+        async def youtube():
+            details = await video_details
+            return await call(search_video, youtube_query(details.title, details.artists), given_video_id=video_id)
+
+        tasks = {YOUTUBE_MUSIC: ytm, YOUTUBE: create_task(youtube()), SPOTIFY: create_task(spotify())}
+
+    elif source == SPOTIFY:
+        track = create_task(call(search_track, url_to_id(url)))
+
+        async def youtube():
+            details = await track
+            return await call(search_video, youtube_query(details.name, details.artists))
+
+        async def youtube_music():
+            details = await track
+            return await call(
+                search_youtube_music_by_name,
+                youtube_query(details.name, details.artists),
+                duration=details.duration_ms // 1000 if details.duration_ms else None,
+                isrc=details.isrc
+            )
+
+        tasks = {YOUTUBE_MUSIC: create_task(youtube_music()), YOUTUBE: create_task(youtube()), SPOTIFY: track}
+
+    else:
+        raise ValueError(f'Unsupported track link - {url}')
+
+    await wait(tasks.values(), timeout=deadline.remaining())
+    conversion = Conversion(url, source, tasks)
+    await conversion.remember()
+    return conversion
+
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from time import monotonic
+
+from Spoyt.exceptions import DeadlineExceededException
+
+
+class Deadline:
+    """Point in time after which a command stops waiting for platforms."""
+    def __init__(self, seconds: float | None = None) -> None:
+        self.expires_at: float | None = None if seconds is None else monotonic() + seconds
+
+    def remaining(self) -> float | None:
+        """Seconds left, or `None` if there is no deadline at all."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - monotonic())
+
+    def timeout(self, default: float | None = None) -> float | None:
+        """Request timeout that respects both `default` and the time left."""
+        if (remaining := self.remaining()) is None:
+            return default
+        return remaining if default is None else min(default, remaining)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() == 0.0
+
+    def check(self) -> None:
+        if self.expired:
+            raise DeadlineExceededException
+
+
+# Used by API calls that were not given a deadline
+UNBOUNDED = Deadline()
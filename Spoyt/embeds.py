@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
+from math import ceil
+
 from discord import Embed, Color
 
 from Spoyt.api.spotify import Playlist, Track
 from Spoyt.api.youtube import YouTubeVideo, YoutubeMusic
+from Spoyt.convert import Conversion, NOT_FOUND, PLATFORMS, SPOTIFY, YOUTUBE, YOUTUBE_MUSIC
+from Spoyt.exceptions import AdmissionException, RateLimitedException, SpotifyNotFoundException, \
+    SpotifyUnreachableException, YouTubeMusicNotFoundException
 from Spoyt.settings import MAX_QUERY
 from Spoyt.utils import markdown_url
 
@@ -10,6 +15,12 @@ from Spoyt.utils import markdown_url
 YOUTUBE_COLOR = Color.from_rgb(255, 0, 0)
 YOUTUBE_MUSIC_COLOR = Color.from_rgb(255, 28, 119)
 
+# Bump whenever any embed layout below changes, so cached renders are not reused.
+TEMPLATE_VERSION: int = 1
+
+# Key of the title embed among rendered embeds of a conversion
+TITLE = 'Title'
+
 
 class BaseEmbed(Embed):
     def __init__(self, *args, **kwargs) -> None:
@@ -35,6 +46,12 @@ class SearchingYouTube(SearchingEmbed):
         super().__init__(*args, **kwargs)
         self.title = '\u23f3 Searching YouTube'
 
+
+class SearchingYouTubeMusic(SearchingEmbed):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.title = '\u23f3 Searching YouTube Music'
+
 # Unreachable
 
 class UnreachableEmbed(BaseEmbed):
@@ -77,6 +94,12 @@ class SpotifyTrackNotFoundEmbed(NotFoundEmbed):
         self.title = 'Spotify track not found'
 
 
+class YouTubeMusicTrackNotFoundEmbed(NotFoundEmbed):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.title = 'YouTube Music track not found'
+
+
 class SpotifyPlaylistkNotFoundEmbed(NotFoundEmbed):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -96,6 +119,21 @@ class CommandOnCooldownEmbed(ErrorEmbed):
         super().__init__(*args, **kwargs)
         self.title = 'Command on cooldown'
 
+
+class BusyEmbed(ErrorEmbed):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.title = 'Bot is busy'
+
+
+class NotAdmittedSummaryEmbed(ErrorEmbed):
+    def __init__(self, url: str, exception: AdmissionException, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.title = url
+        reason = 'Too many links at once' if isinstance(exception, RateLimitedException) else 'Bot is busy'
+        self.description = f'{reason}, retry in {ceil(exception.retry_after)} second(s).'
+
+
 class IncorrectInputEmbed(ErrorEmbed):
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -178,6 +216,28 @@ class YouTubeMusicEmbed(BaseEmbed):
             value=', '.join(ytm_result.artists),
         )
 
+class ConversionSummaryEmbed(BaseEmbed):
+    def __init__(self, conversion: Conversion, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.title = conversion.title or conversion.url
+        lines = []
+        for platform in PLATFORMS:
+            if conversion.is_pending(platform):
+                status = '\u23f3 Searching'
+            elif (link := conversion.link(platform)) is not None:
+                status = markdown_url(link, 'Open')
+            elif isinstance(conversion.error(platform), NOT_FOUND):
+                status = 'Not found'
+            else:
+                status = 'Unavailable'
+            lines.append(f'**{platform}**: {status}')
+        self.description = '\n'.join(lines)
+        if (track := conversion.spotify):
+            self.set_thumbnail(url=track.cover_url)
+        elif (ytm := conversion.youtube_music):
+            self.set_thumbnail(url=ytm.thumbnail)
+
+
 class TitleResponseEmbed(BaseEmbed):
     def __init__(self, track_details: str, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -188,3 +248,56 @@ class UnderConstructionEmbed(BaseEmbed):
         super().__init__(*args, **kwargs)
         self.title = 'Function under construction'
         self.color = Color.gold()
+
+
+def rendered_embeds(conversion: Conversion) -> dict[str, dict] | None:
+    """
+    Serialized title and platform embeds of a fully resolved conversion.
+
+    Rendered once per template version and kept on the conversion, so the same
+    cached conversion is answered without building embeds again.
+    """
+    if not conversion.is_complete:
+        return None
+    if (rendered := conversion.rendered.get(TEMPLATE_VERSION)) is None:
+        rendered = {TITLE: TitleResponseEmbed(conversion.title).to_dict()}
+        rendered |= {p: _platform_embed(conversion, p).to_dict() for p in PLATFORMS}
+        conversion.rendered[TEMPLATE_VERSION] = rendered
+    return rendered
+
+
+def title_response_embed(conversion: Conversion) -> Embed:
+    if (rendered := rendered_embeds(conversion)) is not None:
+        return Embed.from_dict(rendered[TITLE])
+    return TitleResponseEmbed(conversion.title)
+
+
+def _platform_embed(conversion: Conversion, platform: str) -> Embed:
+    result = conversion.result(platform)
+    if platform == SPOTIFY:
+        return SpotifyTrackEmbed(result)
+    if platform == YOUTUBE:
+        return YouTubeVideoEmbed(result)
+    return YouTubeMusicEmbed(result)
+
+
+def conversion_embed(conversion: Conversion, platform: str) -> Embed:
+    """Presents `platform` part of the conversion, whether it is found, pending or failed."""
+    if (rendered := rendered_embeds(conversion)) is not None:
+        return Embed.from_dict(rendered[platform])
+    if conversion.is_pending(platform):
+        return {
+            SPOTIFY: SearchingSpotify,
+            YOUTUBE: SearchingYouTube,
+            YOUTUBE_MUSIC: SearchingYouTubeMusic
+        }[platform](description='Still searching, this message will be updated.')
+    if conversion.result(platform) is not None:
+        return _platform_embed(conversion, platform)
+    e = conversion.error(platform)
+    if isinstance(e, SpotifyNotFoundException):
+        return SpotifyTrackNotFoundEmbed()
+    if isinstance(e, YouTubeMusicNotFoundException):
+        return YouTubeMusicTrackNotFoundEmbed()
+    if isinstance(e, SpotifyUnreachableException):
+        return SpotifyUnreachableEmbed()
+    return ErrorEmbed(description=f'```diff\n- {platform}: {e}\n```')
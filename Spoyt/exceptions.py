@@ -17,6 +17,12 @@ class YouTubeURLException(SpoytException):
         SpoytException.__init__(self, f'{__class__.__name__}: {traceback or message}')
 
 
+class YouTubeMusicNotFoundException(YouTubeException):
+    def __init__(self, traceback='') -> None:
+        message = 'YouTube Music track not found.'
+        YouTubeException.__init__(self, f'{__class__.__name__}: {traceback or message}')
+
+
 class YouTubeForbiddenException(YouTubeException):
     def __init__(self, traceback='') -> None:
         message = 'Bot is not set properly. Ask the bot owner for further information.'
@@ -40,3 +46,28 @@ class SpotifyNotFoundException(SpotifyException):
     def __init__(self, traceback='') -> None:
         message = 'Spotify track not found.'
         SpotifyException.__init__(self, f'{__class__.__name__}: {traceback or message}')
+
+
+class DeadlineExceededException(SpoytException):
+    def __init__(self, traceback='') -> None:
+        message = 'Platform did not respond in time.'
+        SpoytException.__init__(self, f'{__class__.__name__}: {traceback or message}')
+
+
+class AdmissionException(SpoytException):
+    def __init__(self, retry_after: float = 0.0, traceback='') -> None:
+        self.retry_after = retry_after
+        message = 'Command was not admitted.'
+        SpoytException.__init__(self, f'{__class__.__name__}: {traceback or message}')
+
+
+class RateLimitedException(AdmissionException):
+    def __init__(self, retry_after: float = 0.0, traceback='') -> None:
+        message = 'Too many commands from this user or server.'
+        AdmissionException.__init__(self, retry_after, f'{__class__.__name__}: {traceback or message}')
+
+
+class OverloadedException(AdmissionException):
+    def __init__(self, retry_after: float = 0.0, traceback='') -> None:
+        message = 'Bot is busy.'
+        AdmissionException.__init__(self, retry_after, f'{__class__.__name__}: {traceback or message}')
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError, as_completed
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable
+
+from Spoyt import metrics
+from Spoyt.deadline import Deadline, UNBOUNDED
+from Spoyt.exceptions import DeadlineExceededException
+
+
+class Hedger:
+    """
+    Issues a duplicate of slow, idempotent calls and takes whichever finishes first.
+
+    A call is hedged once it runs longer than the `percentile` of recent latencies.
+    Every call earns `budget` of a hedge, so hedges stay under that share of calls,
+    with at most `burst` hedges saved up for spikes.
+    """
+    def __init__(
+        self,
+        name: str,
+        enabled: bool = True,
+        percentile: float = 0.95,
+        budget: float = 0.05,
+        burst: int = 3,
+        window: int = 200,
+        min_samples: int = 20,
+        max_workers: int = 16
+    ) -> None:
+        self.name = name
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget = budget
+        self.burst = burst
+        self.min_samples = min_samples
+        self._latencies: deque[float] = deque(maxlen=window)
+        self._tokens: float = 0.0
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix=f'hedge-{name}')
+        if enabled:
+            metrics.register_gauge(f'{name}.hedge_rate', lambda: self.hedge_rate)
+            metrics.register_gauge(f'{name}.win_rate', lambda: self.win_rate)
+
+    @property
+    def threshold(self) -> float | None:
+        """Seconds after which a call gets hedged, `None` until enough samples are seen."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * self.percentile))]
+
+    @property
+    def hedge_rate(self) -> float:
+        return metrics.get(f'{self.name}.hedged') / max(1, metrics.get(f'{self.name}.calls'))
+
+    @property
+    def win_rate(self) -> float:
+        return metrics.get(f'{self.name}.hedge_wins') / max(1, metrics.get(f'{self.name}.hedged'))
+
+    def _record(self, started: float) -> Callable[[Future], None]:
+        def callback(future: Future) -> None:
+            if not future.cancelled() and future.exception() is None:
+                with self._lock:
+                    self._latencies.append(monotonic() - started)
+        return callback
+
+    def _earn(self) -> None:
+        with self._lock:
+            self._tokens = min(self._tokens + self.budget, self.burst)
+
+    def _spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def call(self, func: Callable[..., Any], *args, deadline: Deadline = UNBOUNDED, **kwargs) -> Any:
+        """Calls `func(*args, **kwargs)`, giving up on it once `deadline` passes."""
+        if not self.enabled:
+            return func(*args, **kwargs)
+
+        metrics.increment(f'{self.name}.calls')
+        self._earn()
+
+        primary = self._executor.submit(func, *args, **kwargs)
+        primary.add_done_callback(self._record(monotonic()))
+        try:
+            return primary.result(timeout=deadline.timeout(self.threshold))
+        except TimeoutError:
+            deadline.check()
+
+        try:
+            if not self._spend():
+                return primary.result(timeout=deadline.timeout())
+
+            metrics.increment(f'{self.name}.hedged')
+            hedge = self._executor.submit(func, *args, **kwargs)
+            hedge.add_done_callback(self._record(monotonic()))
+            for future in as_completed((primary, hedge), timeout=deadline.timeout()):
+                if future.exception() is None:
+                    if future is hedge:
+                        metrics.increment(f'{self.name}.hedge_wins')
+                    return future.result()
+        except TimeoutError:
+            raise DeadlineExceededException
+        # Both failed
+        return primary.result()
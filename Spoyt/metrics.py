@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+from threading import Lock
+from typing import Callable
+
+_counters: Counter[str] = Counter()
+_gauges: dict[str, Callable[[], float]] = {}
+_lock = Lock()
+
+
+def increment(name: str, value: int = 1) -> None:
+    with _lock:
+        _counters[name] += value
+
+
+def get(name: str) -> int:
+    with _lock:
+        return _counters[name]
+
+
+def register_gauge(name: str, read: Callable[[], float]) -> None:
+    """Reports value of `read()` under `name`, whenever metrics are read."""
+    with _lock:
+        _gauges[name] = read
+
+
+def snapshot() -> dict[str, float]:
+    """Current value of every counter and gauge."""
+    with _lock:
+        values: dict[str, float] = dict(_counters)
+        gauges = dict(_gauges)
+    return values | {name: read() for name, read in gauges.items()}
+
+
+def summary() -> str:
+    return ', '.join(f'{name}={round(value, 3)}' for name, value in sorted(snapshot().items())) or 'none'
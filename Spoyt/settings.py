@@ -11,11 +11,53 @@ BOT_TOKEN: str = getenv('BOT_TOKEN')
 # Maximum, visible tracks in playlist
 MAX_QUERY: int = int(getenv('MAX_QUERY', 10))
 
+# Seconds a command waits for platforms before responding with partial results
+COMMAND_DEADLINE: float = float(getenv('COMMAND_DEADLINE', 10.0))
+# Extra seconds to keep waiting for pending platforms and edit them in, 0 disables
+BACKFILL_TIMEOUT: float = float(getenv('BACKFILL_TIMEOUT', 30.0))
+
+# Maximum, completed conversions kept in memory
+CONVERSION_CACHE_SIZE: int = int(getenv('CONVERSION_CACHE_SIZE', 1024))
+
+# SQLite database of every resolved track, searched before platforms, e.g. "catalog.db"; disabled unless set
+CATALOG_PATH: str = getenv('CATALOG_PATH', '')
+# Similarity from 0 to 1 a catalog match needs to be used instead of searching
+CATALOG_MIN_SCORE: float = float(getenv('CATALOG_MIN_SCORE', 0.9))
+
+# Commands a user or server may burst, and seconds to earn another one
+USER_BURST: int = int(getenv('USER_BURST', 3))
+USER_REFILL: float = float(getenv('USER_REFILL', 10.0))
+GUILD_BURST: int = int(getenv('GUILD_BURST', 10))
+GUILD_REFILL: float = float(getenv('GUILD_REFILL', 3.0))
+# Conversions running at once while upstreams are healthy
+MAX_CONCURRENT_CONVERSIONS: int = int(getenv('MAX_CONCURRENT_CONVERSIONS', 8))
+# Commands waiting for a free slot, and seconds they wait before being turned away
+ADMISSION_QUEUE_SIZE: int = int(getenv('ADMISSION_QUEUE_SIZE', 32))
+ADMISSION_WAIT: float = float(getenv('ADMISSION_WAIT', 15.0))
+
+# Convert track links posted in messages, without a command
+LINK_DETECTION: bool = getenv('LINK_DETECTION', 'False').lower() == 'true'
+# Maximum, converted links per message, Discord allows no more than 10 embeds in one
+MAX_LINKS_PER_MESSAGE: int = min(int(getenv('MAX_LINKS_PER_MESSAGE', 10)), 10)
+
 SPOTIFY_CLIENT_ID: str = getenv('SPOTIFY_CLIENT_ID')
 SPOTIFY_CLIENT_SECRET: str = getenv('SPOTIFY_CLIENT_SECRET')
 
 YOUTUBE_API_KEY: str = getenv('YOUTUBE_API_KEY')
+# YouTube Data API units available per day
+YOUTUBE_DAILY_QUOTA: int = int(getenv('YOUTUBE_DAILY_QUOTA', 10000))
 OAUTH_CLIENT_ID: str = getenv('OAUTH_CLIENT_ID','')
 OAUTH_CLIENT_SECRET: str = getenv('OAUTH_CLIENT_SECRET','')
 
 YOUTUBE_MUSIC_BROWSER_OVERRIDE: bool = getenv('YOUTUBE_MUSIC_BROWSER_OVERRIDE', True)
+# Seconds a single YouTube Music request may take
+YOUTUBE_MUSIC_TIMEOUT: float = float(getenv('YOUTUBE_MUSIC_TIMEOUT', 10.0))
+
+# Duplicate YouTube Music lookups slower than the percentile of recent ones
+YOUTUBE_MUSIC_HEDGING: bool = getenv('YOUTUBE_MUSIC_HEDGING', 'False').lower() == 'true'
+HEDGE_PERCENTILE: float = float(getenv('HEDGE_PERCENTILE', 0.95))
+# Maximum share of lookups that may be duplicated
+HEDGE_BUDGET: float = float(getenv('HEDGE_BUDGET', 0.05))
+
+# Seconds between metrics summaries in logs, 0 disables
+METRICS_INTERVAL: float = float(getenv('METRICS_INTERVAL', 300.0))